@@ -0,0 +1,186 @@
+#
+# Batch driving of counter configurations
+#
+# `develop` processes configurations one by one. But a breadth-first
+# explorer may deal with a whole layer of configurations at once.
+# `BatchRules` represents a batch of `n` compact configurations
+# (see `CompactCountersScWorld`) as an `(n, k)` NumPy array of ints,
+# `ω` being represented by `OMEGA`, and evaluates the rules of
+# a `CountersWorld` for all configurations at once:
+#
+#   * The successor configurations of a rule are affine functions
+#     of counters, so the rules are compiled to an `(r, k, k)` array of
+#     coefficients and an `(r, k)` array of constants. A counter of
+#     a successor is `ω` if it depends on a counter that is `ω`.
+#   * Guards and `is_unsafe` are compiled (as in `rule_compiler`)
+#     to vectorized comparisons and logical operations over columns.
+
+import ast
+from typing import Dict, List, Tuple
+
+import numpy
+
+from smrsc.counters import CountersWorld, OMEGA, CC
+from smrsc.rule_compiler import RuleCompiler, function_ast
+
+
+class NumpyRuleCompiler(RuleCompiler):
+
+    @staticmethod
+    def omega_test(vs: List[str]) -> str:
+        return " | ".join("(%s == OMEGA)" % v for v in vs)
+
+    def nw_test(self, e: ast.expr, op: str, k: ast.expr) -> str:
+        vs = self.nw_vars(e)
+        return "(%s | (%s %s %s))" % \
+               (self.omega_test(vs), self.arith(e), op, self.plain(k))
+
+    def plain(self, e: ast.expr) -> str:
+        if isinstance(e, ast.BoolOp):
+            f = "logical_and" if isinstance(e.op, ast.And) else "logical_or"
+            code = self.plain(e.values[0])
+            for e1 in e.values[1:]:
+                code = "numpy.%s(%s, %s)" % (f, code, self.plain(e1))
+            return code
+        elif isinstance(e, ast.UnaryOp) and isinstance(e.op, ast.Not):
+            return "numpy.logical_not(%s)" % self.plain(e.operand)
+        else:
+            return super().plain(e)
+
+
+def affine(params: List[str], e: ast.expr) -> Tuple[Dict[str, int], int]:
+    if isinstance(e, ast.Name) and e.id in params:
+        return {e.id: 1}, 0
+    elif isinstance(e, ast.Constant) and type(e.value) is int:
+        return {}, e.value
+    elif isinstance(e, ast.BinOp) and isinstance(e.op, (ast.Add, ast.Sub)):
+        a1, b1 = affine(params, e.left)
+        a2, b2 = affine(params, e.right)
+        sign = 1 if isinstance(e.op, ast.Add) else -1
+        a = dict(a1)
+        for v, x in a2.items():
+            a[v] = a.get(v, 0) + sign * x
+        return a, b1 + sign * b2
+    raise ValueError("cannot compile: %s" % ast.dump(e))
+
+
+def compile_batch_test(name: str, params: List[str], es: List[ast.expr]) \
+        -> str:
+    rc = NumpyRuleCompiler(params)
+    lines = ["def %s(_c):" % name,
+             "    _n = _c.shape[0]"]
+    for j, p in enumerate(params):
+        lines.append("    %s = _c[:, %d]" % (p, j))
+    lines.append("    return numpy.stack([%s], axis=1)" % ", ".join(
+        "numpy.broadcast_to(numpy.asarray(%s, dtype=bool), (_n,))"
+        % rc.plain(e) for e in es))
+    return "\n".join(lines)
+
+
+class BatchRules:
+
+    def __init__(self, cnt: CountersWorld):
+        params, e = function_ast(type(cnt).rules)
+        if not isinstance(e, ast.List):
+            raise ValueError("cannot compile rules")
+        k = len(params)
+        r = len(e.elts)
+        self.k = k
+        self.coefficients = numpy.zeros((r, k, k), dtype=numpy.int64)
+        self.constants = numpy.zeros((r, k), dtype=numpy.int64)
+        guards = []
+        for i, rule in enumerate(e.elts):
+            if not (isinstance(rule, ast.Tuple) and len(rule.elts) == 2 and
+                    isinstance(rule.elts[1], ast.List) and
+                    len(rule.elts[1].elts) == k):
+                raise ValueError("cannot compile rules")
+            guard, conf = rule.elts
+            guards.append(guard)
+            for j, e1 in enumerate(conf.elts):
+                a, b = affine(params, e1)
+                for v, x in a.items():
+                    self.coefficients[i, j, params.index(v)] = x
+                self.constants[i, j] = b
+        self.dependencies = (self.coefficients != 0).astype(numpy.int64)
+        params_u, e_u = function_ast(type(cnt).is_unsafe)
+        env = {"OMEGA": OMEGA, "numpy": numpy}
+        self.guards_source = compile_batch_test("guards", params, guards)
+        self.is_unsafe_source = \
+            compile_batch_test("is_unsafe", params_u, [e_u])
+        exec(self.guards_source, env)
+        exec(self.is_unsafe_source, env)
+        self.guards_f = env["guards"]
+        self.is_unsafe_f = env["is_unsafe"]
+
+    # (n, k) -> (n, r)
+    def guards(self, cs: numpy.ndarray) -> numpy.ndarray:
+        return self.guards_f(cs)
+
+    # (n, k) -> (n, r, k)
+    def successors(self, cs: numpy.ndarray) -> numpy.ndarray:
+        om = cs == OMEGA
+        xs = numpy.where(om, 0, cs)
+        ss = numpy.einsum('nk,rjk->nrj', xs, self.coefficients) + \
+            self.constants
+        om_ss = numpy.einsum('nk,rjk->nrj', om.astype(numpy.int64),
+                             self.dependencies) > 0
+        return numpy.where(om_ss, OMEGA, ss)
+
+    # (n, k) -> (n,)
+    def is_unsafe(self, cs: numpy.ndarray) -> numpy.ndarray:
+        return self.is_unsafe_f(cs)[:, 0]
+
+
+def batch_is_too_big(cs: numpy.ndarray, max_nw: int) -> numpy.ndarray:
+    return (cs >= max_nw).any(axis=1)
+
+
+# `develop_batch` returns, for an `(n, k)` array of configurations,
+# the guard mask `(n, r)`, the successors `(n, r, k)` (only those
+# for which the guard is true are meaningful), and the `is_unsafe`
+# and `is_too_big` flags `(n,)`.
+
+def develop_batch(rules: BatchRules, cs: numpy.ndarray, max_nw: int) \
+        -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    cs = numpy.asarray(cs, dtype=numpy.int64)
+    return rules.guards(cs), rules.successors(cs), \
+        rules.is_unsafe(cs), batch_is_too_big(cs, max_nw)
+
+
+#
+# A vectorized subsumption index
+#
+# `NumpySubsumptionIndex` can be used instead of `SubsumptionIndex`
+# (see `CompactCountersScWorld.fold_index_class`). The configurations are
+# stored as the rows of an `(n, k)` array, and `covers(c)` compares `c`
+# with all rows at once. The cost of a lookup is still proportional to
+# `n * k`, but the loops are run by NumPy, rather than by the interpreter,
+# which pays off for wide configurations and long histories.
+
+class NumpySubsumptionIndex:
+    __slots__ = ('confs', 'omegas')
+
+    def __init__(self, confs: numpy.ndarray = None,
+                 omegas: numpy.ndarray = None):
+        if confs is None:
+            confs = numpy.zeros((0, 0), dtype=numpy.int64)
+            omegas = numpy.zeros((0, 0), dtype=bool)
+        self.confs = confs
+        self.omegas = omegas
+
+    def __len__(self) -> int:
+        return self.confs.shape[0]
+
+    def add(self, c: CC) -> 'NumpySubsumptionIndex':
+        row = numpy.array([c], dtype=numpy.int64)
+        if len(self) == 0:
+            return NumpySubsumptionIndex(row, row == OMEGA)
+        return NumpySubsumptionIndex(
+            numpy.concatenate([self.confs, row]),
+            numpy.concatenate([self.omegas, row == OMEGA]))
+
+    def covers(self, c: CC) -> bool:
+        if len(self) == 0:
+            return False
+        row = numpy.array(c, dtype=numpy.int64)
+        return bool((self.omegas | (self.confs == row)).all(axis=1).any())
@@ -42,25 +42,74 @@
 #       develop(c) = [drive(c)] + map(lambda cs: [cs] , rebuild(c))
 #
 # * `History` is a list of configuration that have been produced
-#   in order to reach the current configuration.
+#   in order to reach the current configuration. (Technically, it is
+#   a `PersistentHistory`, see below.)
 #
 # * `is_dangerous` is a "whistle" that is used to ensure termination of
 #   supercompilation. `is_dangerous(h)` means that the history has become
 #   "too large".
 #
 # * `is_foldable_to_history(c, h)` means that `c` is foldable to a configuration
-#   in the history `h`.
+#   in the history `h`. By default, the configurations in `h` are checked
+#   one by one, but a world may maintain an index of the history
+#   (see `initial_fold_index`).
+#
+# * `conf_key` and `history_key` are only needed for sharing subgraphs
+#   (see `lazy_mrsc_dag`). `conf_key(c)` is a hashable representation of `c`,
+#   while `history_key(h)` is a hashable representation of the part of `h`
+#   that may affect folding and whistling.
 
 import itertools
 from abc import abstractmethod
-from typing import Generic, List
+from typing import Generic, List, Hashable, Dict, Tuple, Optional, Any, \
+    Iterator
 
 from smrsc.graph import \
     C, cartesian, Graph, Back, Forth, LazyGraph, Empty, Stop, Build
 
 
+# Histories
+#
+# A history is extended by a configuration at each step of
+# supercompilation. Copying the history (`[c] + h`) at each step
+# would take time proportional to its length. Hence, a history is
+# represented by a linked list whose tails are shared.
+#
+# A history iterates over its configurations starting from the most recent
+# one, so that it behaves like `[c_n, ..., c_1]`.
+# Besides, a history carries its length and a "summary", which is updated
+# incrementally by `ScWorld.update_summary` and can be used by the whistle
+# (so that `is_dangerous` need not rescan the whole history).
+# In the same way, a history may carry a "foldability index", which is
+# updated by `ScWorld.extend_fold_index`.
+
+class PersistentHistory(Generic[C]):
+    __slots__ = ('c', 'tail', 'length', 'summary', 'index')
+
+    def __init__(self, c: Optional[C] = None,
+                 tail: Optional['PersistentHistory[C]'] = None,
+                 summary: Any = None, index: Any = None):
+        self.c = c
+        self.tail = tail
+        self.length = 0 if tail is None else tail.length + 1
+        self.summary = summary
+        self.index = index
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[C]:
+        h = self
+        while h.length > 0:
+            yield h.c
+            h = h.tail
+
+    def __repr__(self):
+        return "PersistentHistory(%s)" % list(self)
+
+
 class ScWorld(Generic[C]):
-    History = List[C]
+    History = PersistentHistory[C]
 
     @abstractmethod
     def is_dangerous(self, h: History) -> bool:
@@ -75,8 +124,59 @@ class ScWorld(Generic[C]):
         pass
 
     def is_foldable_to_history(self, c: C, h: History) -> bool:
+        if isinstance(h, PersistentHistory) and h.index is not None:
+            return self.is_foldable_to_index(c, h.index)
         return any(map(lambda c1: self.is_foldable_to(c, c1), h))
 
+    # Foldability indices.
+    # If `initial_fold_index` returns something other than `None`,
+    # histories carry an index that is extended by `extend_fold_index`,
+    # and `is_foldable_to_index(c, index)` must be equivalent to
+    # `is_foldable_to_history(c, h)` for the configurations in `h`.
+    # By default, there is no index.
+
+    def initial_fold_index(self) -> Any:
+        return None
+
+    def extend_fold_index(self, index: Any, c: C) -> Any:
+        return None
+
+    def is_foldable_to_index(self, c: C, index: Any) -> bool:
+        raise ValueError
+
+    # Incremental summaries of histories.
+    # By default, histories carry no summary.
+
+    def initial_summary(self) -> Any:
+        return None
+
+    def update_summary(self, s: Any, c: C) -> Any:
+        return None
+
+    def empty_history(self) -> History:
+        return PersistentHistory(summary=self.initial_summary(),
+                                 index=self.initial_fold_index())
+
+    def extend_history(self, h: History, c: C) -> History:
+        return PersistentHistory(
+            c, h, self.update_summary(h.summary, c),
+            None if h.index is None else self.extend_fold_index(h.index, c))
+
+    # Configurations that are lists are converted to tuples.
+    # Worlds whose configurations are unhashable for any other reason
+    # have to override `conf_key`.
+
+    def conf_key(self, c: C) -> Hashable:
+        if isinstance(c, list):
+            return tuple(map(self.conf_key, c))
+        return c
+
+    # By default, the whole history is taken into account, because
+    # `is_dangerous` may depend on the order of configurations.
+
+    def history_key(self, h: History) -> Hashable:
+        return tuple(map(self.conf_key, h))
+
 
 # Big-step multi-result supercompilation
 # (The naive version builds Cartesian products immediately.)
@@ -88,12 +188,13 @@ def naive_mrsc(w: ScWorld[C], c0: C) -> List[Graph[C]]:
         elif w.is_dangerous(h):
             return []
         else:
+            h1 = w.extend_history(h, c)
             css = w.develop(c)
-            gsss = [cartesian([naive_mrsc_loop([c] + h, c1) for c1 in cs])
+            gsss = [cartesian([naive_mrsc_loop(h1, c1) for c1 in cs])
                     for cs in css]
             return [Forth(c, gs) for gs in itertools.chain(*gsss)]
 
-    return naive_mrsc_loop([], c0)
+    return naive_mrsc_loop(w.empty_history(), c0)
 
 
 # "Lazy" multi-result supercompilation.
@@ -111,8 +212,66 @@ def lazy_mrsc(w: ScWorld[C], c0: C) -> LazyGraph[C]:
         elif w.is_dangerous(h):
             return Empty()
         else:
-            lss = [[lazy_mrsc_loop([c] + h, c1) for c1 in cs]
+            h1 = w.extend_history(h, c)
+            lss = [[lazy_mrsc_loop(h1, c1) for c1 in cs]
                    for cs in w.develop(c)]
             return Build(c, lss)
 
-    return lazy_mrsc_loop([], c0)
+    return lazy_mrsc_loop(w.empty_history(), c0)
+
+
+# "Lazy" multi-result supercompilation with sharing.
+#
+# The subgraph produced by `lazy_mrsc_loop(h, c)` only depends on `c`
+# and on the part of `h` that is relevant to folding and whistling.
+# Hence, `lazy_mrsc_dag` memoizes `Build` nodes by
+#     (conf_key(c), history_key(h))
+# while `Stop(c)` is shared by all occurrences of `c` (and `Empty()` is
+# a singleton anyway).
+#
+# If the history of the children of `c` is dangerous, each child is
+# either a `Stop` or `Empty()`. In this case `Build(c, ...)` is
+# completely determined by `c` and by the children, so that the history
+# need not be taken into account.
+#
+# `lazy_mrsc_dag` returns a `LazyGraph` whose identical subtrees are
+# represented by the same (shared) node. Thus the result is a DAG,
+# rather than a tree, but
+#     unroll(lazy_mrsc_dag(w, c)) == unroll(lazy_mrsc(w, c))
+
+def lazy_mrsc_dag(w: ScWorld[C], c0: C) -> LazyGraph[C]:
+    stops: Dict[Hashable, LazyGraph[C]] = {}
+    builds: Dict[Tuple[Hashable, Hashable], LazyGraph[C]] = {}
+    last_builds: Dict[Tuple[Hashable, tuple], LazyGraph[C]] = {}
+
+    def stop(c: C) -> LazyGraph[C]:
+        key = w.conf_key(c)
+        l = stops.get(key)
+        if l is None:
+            l = stops[key] = Stop(c)
+        return l
+
+    def lazy_mrsc_loop(h: w.History, c: C) -> LazyGraph[C]:
+        if w.is_foldable_to_history(c, h):
+            return stop(c)
+        elif w.is_dangerous(h):
+            return Empty()
+        h1 = w.extend_history(h, c)
+        if w.is_dangerous(h1):
+            lss = [[stop(c1) if w.is_foldable_to_history(c1, h1) else Empty()
+                    for c1 in cs]
+                   for cs in w.develop(c)]
+            key = (w.conf_key(c), tuple(id(l1) for ls in lss for l1 in ls))
+            l = last_builds.get(key)
+            if l is None:
+                l = last_builds[key] = Build(c, lss)
+            return l
+        key = (w.conf_key(c), w.history_key(h))
+        l = builds.get(key)
+        if l is None:
+            lss = [[lazy_mrsc_loop(h1, c1) for c1 in cs]
+                   for cs in w.develop(c)]
+            l = builds[key] = Build(c, lss)
+        return l
+
+    return lazy_mrsc_loop(w.empty_history(), c0)
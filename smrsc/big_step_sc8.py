@@ -25,12 +25,13 @@ def build_cograph(w: ScWorld[C], c0: C) -> LazyGraph8[C]:
             return Stop8(c)
         else:
             def lss():
-                return [[build_cograph_loop([c] + h, c1) for c1 in cs]
+                h1 = w.extend_history(h, c)
+                return [[build_cograph_loop(h1, c1) for c1 in cs]
                         for cs in w.develop(c)]
 
             return Build8(c, lss)
 
-    return build_cograph_loop([], c0)
+    return build_cograph_loop(w.empty_history(), c0)
 
 
 # prune_cograph
@@ -45,13 +46,14 @@ def prune_cograph(w: ScWorld[C], l0: LazyGraph8[C]) -> LazyGraph[C]:
             if w.is_dangerous(h):
                 return Empty()
             else:
-                lss = [[prune_cograph_loop([l.c] + h, l1) for l1 in ls]
+                h1 = w.extend_history(h, l.c)
+                lss = [[prune_cograph_loop(h1, l1) for l1 in ls]
                        for ls in l.lss]
                 return Build(l.c, lss)
         else:
             raise ValueError
 
-    return prune_cograph_loop([], l0)
+    return prune_cograph_loop(w.empty_history(), l0)
 
 
 #
@@ -135,10 +137,11 @@ def prune(w: ScWorld[C], l0: LazyGraph8[C]) -> LazyGraph[C]:
                 return Empty()
             else:
                 lss1 = [ls for ls in l.lss if not (Empty8() in ls)]
-                lss2 = [[prune_loop([l.c] + h, l1) for l1 in ls]
+                h1 = w.extend_history(h, l.c)
+                lss2 = [[prune_loop(h1, l1) for l1 in ls]
                         for ls in lss1]
                 return Build(l.c, lss2)
         else:
             raise ValueError
 
-    return prune_loop([], l0)
+    return prune_loop(w.empty_history(), l0)
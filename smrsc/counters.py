@@ -1,8 +1,9 @@
+import itertools
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Union
+from typing import List, Tuple, Union, Hashable, Dict, FrozenSet
 
 from smrsc.graph import cartesian
-from smrsc.big_step_sc import ScWorld
+from smrsc.big_step_sc import ScWorld, PersistentHistory
 
 
 class NW(ABC):
@@ -41,6 +42,9 @@ class N(NW):
         else:
             return False
 
+    def __hash__(self):
+        return hash(self.i)
+
     def __add__(self, other) -> NW:
         if isinstance(other, W):
             return W()
@@ -97,6 +101,9 @@ class W(NW):
     def __eq__(self, other) -> bool:
         return isinstance(other, W)
 
+    def __hash__(self):
+        return hash(W)
+
     def __add__(self, other) -> NW:
         return W()
 
@@ -164,7 +171,7 @@ class CountersWorld(ABC):
 
 class CountersScWorld(ScWorld[List[NW]]):
     C = List[NW]
-    History = List[C]
+    History = PersistentHistory[C]
 
     def __init__(self, cnt: CountersWorld, max_nw: int, max_depth: int):
         self.cnt = cnt
@@ -184,12 +191,43 @@ class CountersScWorld(ScWorld[List[NW]]):
     def is_too_big(self, c: C) -> bool:
         return any([self.ge_max_n(nw) for nw in c])
 
+    # The summary of a history is "some configuration is too big".
+
+    def initial_summary(self) -> bool:
+        return False
+
+    def update_summary(self, s: bool, c: C) -> bool:
+        return s or self.is_too_big(c)
+
     def is_dangerous(self, h: History) -> bool:
+        if isinstance(h, PersistentHistory):
+            return h.summary or len(h) >= self.max_depth
         return any([self.is_too_big(c) for c in h]) or len(h) >= self.max_depth
 
+    def conf_key(self, c: C) -> Hashable:
+        return tuple(c)
+
+    # `is_dangerous` and `is_foldable_to_history` do not depend on the order
+    # of configurations in the history.
+
+    def history_key(self, h: History) -> Hashable:
+        return frozenset(map(tuple, h)), len(h)
+
     def is_foldable_to(self, c1: C, c2: C) -> bool:
         return all([nw1.is_in(nw2) for nw1, nw2 in zip(c1, c2)])
 
+    # Histories are indexed by `SubsumptionIndex` (see below).
+
+    def initial_fold_index(self) -> 'SubsumptionIndex':
+        return SubsumptionIndex()
+
+    def extend_fold_index(self, index: 'SubsumptionIndex', c: C) \
+            -> 'SubsumptionIndex':
+        return index.add(encode_conf(c))
+
+    def is_foldable_to_index(self, c: C, index: 'SubsumptionIndex') -> bool:
+        return index.covers(encode_conf(c))
+
     # Driving is deterministic
     def drive(self, c: C) -> List[C]:
         return [norm_nw_conf(r) for p, r in self.cnt.rules(*c) if p]
@@ -212,3 +250,181 @@ class CountersScWorld(ScWorld[List[NW]]):
 
     def develop(self, c: C) -> List[List[C]]:
         return [self.drive(c)] + [[c] for c in self.rebuild(c)]
+
+
+#
+# Compact configurations
+#
+# A configuration `List[NW]` is encoded as a tuple of ints, `ω` being
+# represented by `OMEGA`. Compact configurations are immutable
+# and hashable, and the checks performed by the whistle and folding
+# are reduced to comparisons of small ints.
+#
+# `OMEGA` is a large negative number, rather than -1, because rules may
+# produce negative counters (for example, a guard `i >= 0` followed by
+# `i - 1`). Since `OMEGA` is negative, `OMEGA >= max_nw` is always false,
+# and `is_too_big` needs no special case for `ω`.
+
+OMEGA = -2 ** 62
+
+CC = Tuple[int, ...]
+
+
+def encode_nw(nw: Union[NW, int]) -> int:
+    if isinstance(nw, int):
+        return nw
+    elif isinstance(nw, W):
+        return OMEGA
+    elif isinstance(nw, N):
+        return nw.i
+    else:
+        raise ValueError
+
+
+def decode_nw(i: int) -> NW:
+    return W() if i == OMEGA else N(i)
+
+
+def encode_conf(c: List[Union[NW, int]]) -> CC:
+    return tuple(map(encode_nw, c))
+
+
+def decode_conf(c: CC) -> List[NW]:
+    return list(map(decode_nw, c))
+
+
+def cc_pp(c: CC):
+    return "(" + ", ".join("ω" if i == OMEGA else str(i) for i in c) + ")"
+
+
+#
+# Subsumption index
+#
+# A configuration `c` is foldable to `c1` if `c` coincides with `c1`
+# at the positions where `c1` is not `ω`. Let us call the tuple of these
+# positions the "pattern" of `c1`. A `SubsumptionIndex` groups
+# (compact) configurations by their patterns, and stores, for each pattern,
+# the set of the projections of the configurations onto their patterns.
+# Then `c` is foldable to some configuration in the index if
+# the projection of `c` onto some pattern is in the set for this pattern.
+#
+# Thus, the cost of `covers(c)` is proportional to the width of `c`
+# times the number of distinct patterns (which is small in practice),
+# rather than to the number of configurations.
+#
+# An index is immutable, so that it can be shared by histories:
+# `add` returns a new index, copying only the set for one pattern.
+
+class SubsumptionIndex:
+    __slots__ = ('patterns',)
+
+    def __init__(self, patterns: Dict[Tuple[int, ...], FrozenSet[CC]] = None):
+        self.patterns = {} if patterns is None else patterns
+
+    def __len__(self) -> int:
+        return sum(map(len, self.patterns.values()))
+
+    def add(self, c: CC) -> 'SubsumptionIndex':
+        ps = tuple(i for i, x in enumerate(c) if x != OMEGA)
+        proj = tuple(map(c.__getitem__, ps))
+        s = self.patterns.get(ps)
+        if s is None:
+            s = frozenset([proj])
+        elif proj in s:
+            return self
+        else:
+            s = s | {proj}
+        patterns = dict(self.patterns)
+        patterns[ps] = s
+        return SubsumptionIndex(patterns)
+
+    def covers(self, c: CC) -> bool:
+        for ps, s in self.patterns.items():
+            if tuple(map(c.__getitem__, ps)) in s:
+                return True
+        return False
+
+
+# `CompactCountersScWorld` is equivalent to `CountersScWorld`, except that
+# configurations are compact. The rules of a `CountersWorld` are defined
+# in terms of `NW`, so `drive` and `is_unsafe` decode configurations.
+# But their results are cached, because the number of distinct
+# configurations is small as compared to the number of nodes in a graph.
+
+class CompactCountersScWorld(ScWorld[CC]):
+    C = CC
+    History = PersistentHistory[C]
+
+    def __init__(self, cnt: CountersWorld, max_nw: int, max_depth: int):
+        self.cnt = cnt
+        self.start = encode_conf(cnt.start())
+        self.max_nw = max_nw
+        self.max_depth = max_depth
+        self.drive_cache: Dict[CC, List[CC]] = {}
+        self.unsafe_cache: Dict[CC, bool] = {}
+
+    def is_unsafe(self, c: C) -> bool:
+        r = self.unsafe_cache.get(c)
+        if r is None:
+            r = self.unsafe_cache[c] = self.cnt.is_unsafe(*decode_conf(c))
+        return r
+
+    def is_too_big(self, c: C) -> bool:
+        max_nw = self.max_nw
+        for i in c:
+            if i >= max_nw:
+                return True
+        return False
+
+    def initial_summary(self) -> bool:
+        return False
+
+    def update_summary(self, s: bool, c: C) -> bool:
+        return s or self.is_too_big(c)
+
+    def is_dangerous(self, h: History) -> bool:
+        if isinstance(h, PersistentHistory):
+            return h.summary or len(h) >= self.max_depth
+        return len(h) >= self.max_depth or any(map(self.is_too_big, h))
+
+    def conf_key(self, c: C) -> Hashable:
+        return c
+
+    def history_key(self, h: History) -> Hashable:
+        return frozenset(h), len(h)
+
+    def is_foldable_to(self, c1: C, c2: C) -> bool:
+        for i1, i2 in zip(c1, c2):
+            if i2 != OMEGA and i1 != i2:
+                return False
+        return True
+
+    # The class of foldability indices. Any class providing `add` and
+    # `covers` will do (see `NumpySubsumptionIndex` in `batch_driving`).
+
+    fold_index_class = SubsumptionIndex
+
+    def initial_fold_index(self):
+        return self.fold_index_class()
+
+    def extend_fold_index(self, index, c: C):
+        return index.add(c)
+
+    def is_foldable_to_index(self, c: C, index) -> bool:
+        return index.covers(c)
+
+    def drive(self, c: C) -> List[C]:
+        cs = self.drive_cache.get(c)
+        if cs is None:
+            cs = self.drive_cache[c] = \
+                [encode_conf(r) for p, r in self.cnt.rules(*decode_conf(c))
+                 if p]
+        return cs
+
+    def rebuild(self, c: C) -> List[C]:
+        cs = itertools.product(*[(OMEGA,) if i == OMEGA else (i, OMEGA)
+                                 for i in c])
+        return [c1 for c1 in cs if c1 != c]
+
+    def develop(self, c: C) -> List[List[C]]:
+        return [self.drive(c)] + [[c1] for c1 in self.rebuild(c)]
@@ -26,8 +26,11 @@
 #      introducing a let-expression or applying a lemma during
 #      two-level supercompilation).
 
+import heapq
 import itertools
-from typing import TypeVar, Generic, List, Optional, Callable, Tuple
+from abc import abstractmethod
+from typing import \
+    TypeVar, Generic, List, Optional, Callable, Tuple, Dict, Iterator
 
 from numpy.core import long
 
@@ -207,6 +210,60 @@ def unroll(l: LazyGraph[C]) -> List[Graph[C]]:
         raise ValueError
 
 
+# `iter_unroll` is a streaming version of `unroll`:
+#     list(iter_unroll(l)) == unroll(l)
+# The graphs are generated one by one, and only the generators along
+# the current path are kept alive. Hence, the memory used is proportional
+# to the size of the current graph, rather than to the number of graphs.
+#
+# Alternatives containing a subtree that represents the empty set of graphs
+# are skipped without being explored, so that the first graph is produced
+# in time proportional to the number of distinct nodes. (Emptiness is
+# cached by node identity during a single call.)
+
+def iter_unroll(l: LazyGraph[C]) -> Iterator[Graph[C]]:
+    nonempty_memo: Dict[int, bool] = {}
+
+    def is_nonempty(l: LazyGraph[C]) -> bool:
+        if isinstance(l, Empty):
+            return False
+        elif isinstance(l, Stop):
+            return True
+        elif isinstance(l, Build):
+            r = nonempty_memo.get(id(l))
+            if r is None:
+                r = nonempty_memo[id(l)] = \
+                    any(all(map(is_nonempty, ls)) for ls in l.lss)
+            return r
+        else:
+            raise ValueError
+
+    def loop(l: LazyGraph[C]) -> Iterator[Graph[C]]:
+        if isinstance(l, Empty):
+            return
+        elif isinstance(l, Stop):
+            yield Back(l.c)
+        elif isinstance(l, Build):
+            for ls in l.lss:
+                if all(map(is_nonempty, ls)):
+                    for gs in loop_ls(ls, 0, []):
+                        yield Forth(l.c, gs)
+        else:
+            raise ValueError
+
+    def loop_ls(ls: List[LazyGraph[C]], i: int, gs: List[Graph[C]]) \
+            -> Iterator[List[Graph[C]]]:
+        if i == len(ls):
+            yield list(gs)
+        else:
+            for g in loop(ls[i]):
+                gs.append(g)
+                yield from loop_ls(ls, i + 1, gs)
+                gs.pop()
+
+    return loop(l)
+
+
 # Usually, we are not interested in the whole bag `unroll(l)`.
 # The goal is to find "the best" or "most interesting" graphs.
 # Hence, there should be developed some techniques of extracting
@@ -265,17 +322,35 @@ def fl_bad_conf(bad: Callable[[C], bool], gs: List[Graph[C]]) -> List[Graph[C]]:
 #
 
 # `cl_empty` removes subtrees that represent empty sets of graphs.
+#
+# Lazy graphs may contain shared subtrees (see `lazy_mrsc_dag`).
+# Hence, the results of analyses are cached by node identity,
+# so that each distinct node is analysed only once, and the subtrees
+# of the result are shared in the same way as those of the argument.
+# (The cache only lives during a single call, because the identity of
+# a node may be reused after the node has been garbage-collected.)
 
 def cl_empty(l: LazyGraph[C]) -> LazyGraph[C]:
-    if isinstance(l, Empty):
-        return l
-    elif isinstance(l, Stop):
-        return l
-    elif isinstance(l, Build):
-        lss1 = cl_empty2(l.lss)
-        return Empty() if len(lss1) == 0 else Build(l.c, lss1)
-    else:
-        raise ValueError
+    memo: Dict[int, LazyGraph[C]] = {}
+
+    def loop(l: LazyGraph[C]) -> LazyGraph[C]:
+        if isinstance(l, Empty):
+            return l
+        elif isinstance(l, Stop):
+            return l
+        elif isinstance(l, Build):
+            l1 = memo.get(id(l))
+            if l1 is None:
+                lss1 = [ls1 for ls1 in ([loop(l1) for l1 in ls]
+                                        for ls in l.lss)
+                        if not (Empty() in ls1)]
+                l1 = Empty() if len(lss1) == 0 else Build(l.c, lss1)
+                memo[id(l)] = l1
+            return l1
+        else:
+            raise ValueError
+
+    return loop(l)
 
 
 def cl_empty2(lss: List[List[LazyGraph[C]]]) -> List[List[LazyGraph[C]]]:
@@ -296,15 +371,24 @@ def cl_empty1(ls: List[LazyGraph[C]]) -> Optional[List[LazyGraph[C]]]:
 def cl_bad_conf(bad: Callable[[C], bool]) \
         -> Callable[[LazyGraph[C]], LazyGraph[C]]:
     def inspect(l: LazyGraph[C]) -> LazyGraph[C]:
-        if isinstance(l, Empty):
-            return Empty()
-        elif isinstance(l, Stop):
-            return Empty() if bad(l.c) else l
-        elif isinstance(l, Build):
-            return Empty() if bad(l.c) else \
-                Build(l.c, [[inspect(l1) for l1 in ls] for ls in l.lss])
-        else:
-            raise ValueError
+        memo: Dict[int, LazyGraph[C]] = {}
+
+        def loop(l: LazyGraph[C]) -> LazyGraph[C]:
+            if isinstance(l, Empty):
+                return Empty()
+            elif isinstance(l, Stop):
+                return Empty() if bad(l.c) else l
+            elif isinstance(l, Build):
+                l1 = memo.get(id(l))
+                if l1 is None:
+                    l1 = Empty() if bad(l.c) else \
+                        Build(l.c, [[loop(l1) for l1 in ls] for ls in l.lss])
+                    memo[id(l)] = l1
+                return l1
+            else:
+                raise ValueError
+
+        return loop(l)
 
     return inspect
 
@@ -321,6 +405,105 @@ def cl_empty_and_bad(bad: Callable[[C], bool]) \
     return inspect
 
 
+#
+# Semiring analyses of lazy graphs
+#
+
+# `length_unroll`, `size_unroll` and `sel_min_size` are folds of the same
+# shape: the alternatives in `lss` are "added", while the subtrees of
+# an alternative are "multiplied". So, given a semiring
+#     (zero, one, add, mul)
+# extended with the functions
+#     stop(c) - the value of `Stop(c)`
+#     build(c, x) - the value of `Build(c, lss)`, where `x` is the sum
+#         of the products for the alternatives in `lss`
+# `eval_semiring` performs a single bottom-up pass over a lazy graph.
+# The values are cached by node identity, so that shared subtrees
+# are analysed only once. (The cache only lives during a single call.)
+#
+# Note that `add` is applied as `add(acc, x)`, where `x` is the value of
+# the next alternative.
+
+class Semiring(Generic[X]):
+
+    @abstractmethod
+    def zero(self) -> X:
+        pass
+
+    @abstractmethod
+    def one(self) -> X:
+        pass
+
+    @abstractmethod
+    def add(self, x1: X, x2: X) -> X:
+        pass
+
+    @abstractmethod
+    def mul(self, x1: X, x2: X) -> X:
+        pass
+
+    @abstractmethod
+    def stop(self, c: C) -> X:
+        pass
+
+    @abstractmethod
+    def build(self, c: C, x: X) -> X:
+        pass
+
+
+def eval_semiring(s: Semiring[X], l: LazyGraph[C]) -> X:
+    memo: Dict[int, X] = {}
+
+    def loop(l: LazyGraph[C]) -> X:
+        if isinstance(l, Empty):
+            return s.zero()
+        elif isinstance(l, Stop):
+            return s.stop(l.c)
+        elif isinstance(l, Build):
+            if id(l) in memo:
+                return memo[id(l)]
+            x = s.zero()
+            for ls in l.lss:
+                p = s.one()
+                for l1 in ls:
+                    p = s.mul(p, loop(l1))
+                x = s.add(x, p)
+            x = s.build(l.c, x)
+            memo[id(l)] = x
+            return x
+        else:
+            raise ValueError
+
+    return loop(l)
+
+
+# Several analyses can be performed in a single pass by evaluating
+# a tuple of semirings.
+
+class TupleSemiring(Semiring[tuple]):
+
+    def __init__(self, *ss: Semiring):
+        self.ss = ss
+
+    def zero(self) -> tuple:
+        return tuple(s.zero() for s in self.ss)
+
+    def one(self) -> tuple:
+        return tuple(s.one() for s in self.ss)
+
+    def add(self, x1: tuple, x2: tuple) -> tuple:
+        return tuple(s.add(y1, y2) for s, y1, y2 in zip(self.ss, x1, x2))
+
+    def mul(self, x1: tuple, x2: tuple) -> tuple:
+        return tuple(s.mul(y1, y2) for s, y1, y2 in zip(self.ss, x1, x2))
+
+    def stop(self, c: C) -> tuple:
+        return tuple(s.stop(c) for s in self.ss)
+
+    def build(self, c: C, x: tuple) -> tuple:
+        return tuple(s.build(c, y) for s, y in zip(self.ss, x))
+
+
 #
 # Extracting a graph of minimal size (if any).
 #
@@ -350,19 +533,66 @@ OILG = Tuple[OI, LazyGraph[C]]
 OILLG = Tuple[OI, List[LazyGraph[C]]]
 
 
-def sel_min_size(l: LazyGraph[C]) -> OILG:
-    if isinstance(l, Empty):
-        return None, Empty()
-    elif isinstance(l, Stop):
-        return 1, l
-    elif isinstance(l, Build):
-        k, ls = sel_min_size2(l.lss)
+# `sel_min_size` is a semiring analysis whose values are pairs
+# (k, ws), where `ws` is a sequence of lazy graphs, each of them
+# representing a single graph, and `k` is the total size of these graphs.
+# "Multiplication" concatenates the sequences, while "addition" selects
+# the pair with the smallest size. (In case of a tie, the last
+# alternative is selected.)
+#
+# The sequences are represented by "reversed" linked lists
+#     (l_n, (l_n-1, ... (l_1, None)))
+# so that appending the witness of a subtree to the product
+# of the preceding subtrees takes constant time, and the witnesses
+# of an alternative are collected into a list only once, by `build`.
+
+Ws = Optional[Tuple[LazyGraph[C], 'Ws']]
+OIWs = Tuple[OI, Ws]
+
+
+def ws_to_list(ws: Ws) -> List[LazyGraph[C]]:
+    ls = []
+    while ws is not None:
+        l, ws = ws
+        ls.append(l)
+    ls.reverse()
+    return ls
+
+
+class MinSizeSemiring(Semiring[OIWs]):
+
+    def zero(self) -> OIWs:
+        return None, (Empty(), None)
+
+    def one(self) -> OIWs:
+        return 0, None
+
+    def add(self, x1: OIWs, x2: OIWs) -> OIWs:
+        return select_min2(x2, x1)
+
+    def mul(self, x1: OIWs, x2: OIWs) -> OIWs:
+        k1, ws = x1
+        k2, ws2 = x2
+        for l in ws_to_list(ws2):
+            ws = (l, ws)
+        return add_min_size(k1, k2), ws
+
+    def stop(self, c: C) -> OIWs:
+        return 1, (Stop(c), None)
+
+    def build(self, c: C, x: OIWs) -> OIWs:
+        k, ws = x
         if k is None:
-            return None, Empty()
+            return self.zero()
         else:
-            return 1 + k, Build(l.c, [ls])
-    else:
-        raise ValueError
+            return 1 + k, (Build(c, [ws_to_list(ws)]), None)
+
+
+def sel_min_size(l: LazyGraph[C]) -> OILG:
+    if isinstance(l, Stop):
+        return 1, l
+    k, (l1, _) = eval_semiring(MinSizeSemiring(), l)
+    return k, l1
 
 
 def select_min2(kx1: OILLG, kx2: OILLG) -> OILLG:
@@ -376,32 +606,88 @@ def select_min2(kx1: OILLG, kx2: OILLG) -> OILLG:
         return kx1 if k1 <= k2 else kx2
 
 
-def sel_min_size2(lss: List[List[LazyGraph[C]]]) -> OILLG:
-    acc = None, []
-    for ls in lss:
-        acc = select_min2(sel_min_size_and(ls), acc)
-    return acc
-
-
-def sel_min_size_and(ls: List[LazyGraph[C]]) -> OILLG:
-    k = 0
-    ls1 = []
-    for l in ls:
-        k1, l1 = sel_min_size(l)
-        k = add_min_size(k, k1)
-        ls1.append(l1)
-    return k, ls1
-
-
 def add_min_size(x1: OI, x2: OI) -> OI:
     if x1 is None or x2 is None:
         return None
     else:
         return x1 + x2
 
+
 #
 # `cl_min_size` is sound:
 #
 #  Let cl_min_size(l) == (k , l'). Then
 #     unroll(l') ⊆ unroll(l)
 #     k == graph_size ((unroll(l')[0]))
+
+
+#
+# Extracting the k smallest graphs.
+#
+
+# `cl_top_k_size(l, k)` generalizes `cl_min_size`: it produces a lazy graph
+# representing the `k` smallest graphs in `unroll(l)` (or all of them,
+# if there are fewer than `k` graphs), in the order of increasing size.
+#
+# This is again a semiring analysis. The values are lists of at most `k`
+# pairs (n, ws), sorted by n, where `ws` is a sequence of lazy graphs
+# representing single graphs (as in `MinSizeSemiring`), and `n` is
+# their total size. "Addition" merges two lists, while "multiplication"
+# selects the `k` smallest sums of pairs. So, the cost depends on `k`,
+# rather than on the number of graphs.
+
+KWs = List[Tuple[long, Ws]]
+
+
+class TopKSizeSemiring(Semiring[KWs]):
+
+    def __init__(self, k: int):
+        self.k = k
+
+    def zero(self) -> KWs:
+        return []
+
+    def one(self) -> KWs:
+        return [(0, None)]
+
+    def add(self, x1: KWs, x2: KWs) -> KWs:
+        return list(itertools.islice(
+            heapq.merge(x1, x2, key=lambda nws: nws[0]), self.k))
+
+    def mul(self, x1: KWs, x2: KWs) -> KWs:
+        if len(x1) == 0 or len(x2) == 0:
+            return []
+        result = []
+        heap = [(x1[0][0] + x2[0][0], 0, 0)]
+        seen = {(0, 0)}
+        while heap and len(result) < self.k:
+            n, i, j = heapq.heappop(heap)
+            ws = x1[i][1]
+            for l in ws_to_list(x2[j][1]):
+                ws = (l, ws)
+            result.append((n, ws))
+            for i1, j1 in ((i + 1, j), (i, j + 1)):
+                if i1 < len(x1) and j1 < len(x2) and (i1, j1) not in seen:
+                    seen.add((i1, j1))
+                    heapq.heappush(heap, (x1[i1][0] + x2[j1][0], i1, j1))
+        return result
+
+    def stop(self, c: C) -> KWs:
+        return [(1, (Stop(c), None))]
+
+    def build(self, c: C, x: KWs) -> KWs:
+        return [(1 + n, (Build(c, [ws_to_list(ws)]), None)) for n, ws in x]
+
+
+def sel_top_k_size(l: LazyGraph[C], k: int) -> List[Tuple[long, LazyGraph[C]]]:
+    return [(n, l1) for n, (l1, _) in eval_semiring(TopKSizeSemiring(k), l)]
+
+
+def cl_top_k_size(l: LazyGraph[C], k: int) -> LazyGraph[C]:
+    nls = sel_top_k_size(l, k)
+    if len(nls) == 0:
+        return Empty()
+    elif isinstance(l, Stop):
+        return l
+    else:
+        return Build(l.c, [l1.lss[0] for _, l1 in nls])
@@ -0,0 +1,187 @@
+#
+# Random access to the graphs represented by a lazy graph
+#
+# Since `length_unroll` counts the graphs represented by a lazy graph
+# without generating them, it is possible to find the i-th element
+# of `unroll(l)` directly, by descending from the root and choosing,
+# at each `Build` node, an alternative and a combination of subgraphs
+# ("unranking"). The number of steps is proportional to the size
+# of the graph produced. Conversely, the position of a graph in `unroll(l)`
+# can be computed without generating the preceding graphs ("ranking").
+#
+# Hence
+#     nth_graph(l, i) == unroll(l)[i]
+#     graph_index(l, g) == unroll(l).index(g)
+#
+
+import random
+from typing import Generic, Dict, List, Tuple, Optional
+from numpy import long
+
+from smrsc.graph import C, Graph, Back, Forth, LazyGraph, Empty, Stop, Build
+
+
+# A `LengthTable` caches, for each `Build` node of a lazy graph,
+# the numbers of graphs represented by its alternatives.
+# The nodes are stored in the table together with the numbers, so that
+# their identities cannot be reused while the table is alive.
+# Thus, a table can be used for any number of queries about the same
+# lazy graph (or its subgraphs).
+
+class LengthTable(Generic[C]):
+
+    def __init__(self, l: LazyGraph[C]):
+        self.l = l
+        self.table: Dict[int, Tuple[LazyGraph[C], List[long]]] = {}
+
+    def alt_lengths(self, l: Build) -> List[long]:
+        entry = self.table.get(id(l))
+        if entry is None:
+            ks = []
+            for ls in l.lss:
+                m: long = 1
+                for l1 in ls:
+                    m *= self.length(l1)
+                ks.append(m)
+            entry = self.table[id(l)] = l, ks
+        return entry[1]
+
+    def length(self, l: Optional[LazyGraph[C]] = None) -> long:
+        if l is None:
+            l = self.l
+        if isinstance(l, Empty):
+            return 0
+        elif isinstance(l, Stop):
+            return 1
+        elif isinstance(l, Build):
+            return sum(self.alt_lengths(l))
+        else:
+            raise ValueError
+
+    # The order of graphs is the same as in `unroll`: the alternatives
+    # are taken in turn, and, within an alternative, the combinations of
+    # subgraphs are ordered lexicographically (as by `cartesian`),
+    # the first subgraph being the most significant "digit".
+
+    def nth(self, i: long, l: Optional[LazyGraph[C]] = None) -> Graph[C]:
+        if l is None:
+            l = self.l
+        n = self.length(l)
+        if i < 0:
+            i += n
+        if not (0 <= i < n):
+            raise IndexError("graph index out of range")
+        return self.nth_loop(l, i)
+
+    def nth_loop(self, l: LazyGraph[C], i: long) -> Graph[C]:
+        if isinstance(l, Stop):
+            return Back(l.c)
+        elif isinstance(l, Build):
+            for ls, k in zip(l.lss, self.alt_lengths(l)):
+                if i < k:
+                    return Forth(l.c, self.nth_ls(ls, i))
+                i -= k
+        raise ValueError
+
+    def nth_ls(self, ls: List[LazyGraph[C]], i: long) -> List[Graph[C]]:
+        js = []
+        for l in reversed(ls):
+            i, j = divmod(i, self.length(l))
+            js.append(j)
+        return [self.nth_loop(l, j) for l, j in zip(ls, reversed(js))]
+
+    def index(self, g: Graph[C], l: Optional[LazyGraph[C]] = None) -> long:
+        if l is None:
+            l = self.l
+        i = self.index_loop(l, g, {})
+        if i is None:
+            raise ValueError("graph is not in unroll(l)")
+        return i
+
+    # A subgraph of `g` may match several alternatives, so the results
+    # are cached by the identities of the lazy graph and the graph.
+
+    def index_loop(self, l: LazyGraph[C], g: Graph[C],
+                   memo: Dict[Tuple[int, int], Optional[long]]) \
+            -> Optional[long]:
+        if isinstance(l, Empty):
+            return None
+        elif isinstance(l, Stop):
+            return 0 if isinstance(g, Back) and g.c == l.c else None
+        elif isinstance(l, Build):
+            if not (isinstance(g, Forth) and g.c == l.c):
+                return None
+            key = id(l), id(g)
+            if key in memo:
+                return memo[key]
+            i = None
+            offset: long = 0
+            for ls, k in zip(l.lss, self.alt_lengths(l)):
+                if k > 0 and len(ls) == len(g.gs):
+                    i = self.index_ls(ls, g.gs, memo)
+                    if i is not None:
+                        i += offset
+                        break
+                offset += k
+            memo[key] = i
+            return i
+        else:
+            raise ValueError
+
+    def index_ls(self, ls: List[LazyGraph[C]], gs: List[Graph[C]],
+                 memo: Dict[Tuple[int, int], Optional[long]]) \
+            -> Optional[long]:
+        i: long = 0
+        for l, g in zip(ls, gs):
+            j = self.index_loop(l, g, memo)
+            if j is None:
+                return None
+            i = i * self.length(l) + j
+        return i
+
+
+def nth_graph(l: LazyGraph[C], i: long) -> Graph[C]:
+    return LengthTable(l).nth(i)
+
+
+def graph_index(l: LazyGraph[C], g: Graph[C]) -> long:
+    return LengthTable(l).index(g)
+
+
+#
+# Uniform random sampling of graphs
+#
+# A graph chosen uniformly at random from `unroll(l)` is just
+# `nth_graph(l, i)` for a random `i`. Since the lengths are cached in
+# a `LengthTable`, drawing `k` graphs costs a single counting pass plus
+# a descent from the root for each graph.
+#
+# Note that `unroll(l)` is a bag: if a graph occurs in it several times,
+# it is proportionally more likely to be drawn. Sampling without
+# replacement draws distinct positions in `unroll(l)`.
+
+def sample_graphs(l: LazyGraph[C], k: int, replace: bool = True,
+                  seed=None, table: Optional[LengthTable[C]] = None) \
+        -> List[Graph[C]]:
+    if table is None:
+        table = LengthTable(l)
+    rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+    n = table.length(l)
+    if replace:
+        if n == 0 and k > 0:
+            raise ValueError("cannot sample from an empty set of graphs")
+        indices = [rng.randrange(n) for _ in range(k)]
+    elif k > n:
+        raise ValueError("sample larger than the set of graphs")
+    elif 2 * k >= n:
+        indices = rng.sample(range(n), k)
+    else:
+        # `n` may be too large for `random.sample`.
+        seen = set()
+        indices = []
+        while len(indices) < k:
+            i = rng.randrange(n)
+            if i not in seen:
+                seen.add(i)
+                indices.append(i)
+    return [table.nth(i, l) for i in indices]
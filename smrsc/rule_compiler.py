@@ -0,0 +1,201 @@
+#
+# Compiling the rules of counter systems
+#
+# The rules of a `CountersWorld` are written in Python as
+#
+#     @staticmethod
+#     def rules(i: NW, e: NW, ...) -> List[Tuple[bool, C]]:
+#         return [
+#             (guard_1, [expr, ..., expr]),
+#             ...
+#             (guard_n, [expr, ..., expr])]
+#
+#     @staticmethod
+#     def is_unsafe(i: NW, e: NW, ...) -> bool:
+#         return condition
+#
+# where expressions are sums and differences of counters and constants,
+# while guards and conditions are built from `x >= k`, `x.is_eq(k)`,
+# `and`, `or` and `not`. Interpreting the rules requires creating `NW`
+# objects and calling overloaded operators for each configuration.
+#
+# `compile_counters_world` takes the source code of `rules` and `is_unsafe`
+# and translates it into Python functions working on compact configurations
+# (tuples of ints, see `CompactCountersScWorld`), the semantics of `ω`
+# being "inlined":
+#
+#   * a sum or difference is `ω` if one of the counters in it is `ω`,
+#   * `x >= k` and `x.is_eq(k)` are true if `x` is `ω`.
+#
+# The compiled functions compute the same results as the rules
+# interpreted over `NW`.
+
+import ast
+import inspect
+import textwrap
+from typing import List, Callable, Tuple
+
+from smrsc.counters import \
+    CountersWorld, CompactCountersScWorld, CC, OMEGA
+
+
+class RuleCompiler:
+
+    def __init__(self, params: List[str]):
+        self.params = params
+
+    def is_nw(self, e: ast.expr) -> bool:
+        if isinstance(e, ast.Name):
+            return e.id in self.params
+        elif isinstance(e, ast.BinOp) and \
+                isinstance(e.op, (ast.Add, ast.Sub)):
+            return self.is_nw(e.left) or self.is_nw(e.right)
+        else:
+            return False
+
+    def nw_vars(self, e: ast.expr) -> List[str]:
+        if isinstance(e, ast.Name) and e.id in self.params:
+            return [e.id]
+        elif isinstance(e, ast.BinOp) and self.is_nw(e):
+            vs = self.nw_vars(e.left)
+            return vs + [v for v in self.nw_vars(e.right) if v not in vs]
+        else:
+            return []
+
+    def arith(self, e: ast.expr) -> str:
+        if isinstance(e, ast.Name) and e.id in self.params:
+            return e.id
+        elif isinstance(e, ast.BinOp) and self.is_nw(e):
+            op = "+" if isinstance(e.op, ast.Add) else "-"
+            return "(%s %s %s)" % (self.arith(e.left), op, self.arith(e.right))
+        else:
+            return self.plain(e)
+
+    @staticmethod
+    def omega_test(vs: List[str]) -> str:
+        return " or ".join("%s == OMEGA" % v for v in vs)
+
+    # The value of a counter expression.
+
+    def nw(self, e: ast.expr) -> str:
+        vs = self.nw_vars(e)
+        if len(vs) == 0:
+            return self.plain(e)
+        elif isinstance(e, ast.Name):
+            return e.id
+        else:
+            return "(OMEGA if %s else %s)" % (self.omega_test(vs), self.arith(e))
+
+    # A test that is true for `ω`.
+
+    def nw_test(self, e: ast.expr, op: str, k: ast.expr) -> str:
+        vs = self.nw_vars(e)
+        return "(%s or %s %s %s)" % \
+               (self.omega_test(vs), self.arith(e), op, self.plain(k))
+
+    # Expressions not involving `NW`.
+
+    def plain(self, e: ast.expr) -> str:
+        if isinstance(e, ast.Constant) and \
+                isinstance(e.value, (int, bool)):
+            return repr(e.value)
+        elif isinstance(e, ast.BoolOp):
+            op = " and " if isinstance(e.op, ast.And) else " or "
+            return "(%s)" % op.join(map(self.plain, e.values))
+        elif isinstance(e, ast.UnaryOp) and isinstance(e.op, ast.Not):
+            return "(not %s)" % self.plain(e.operand)
+        elif isinstance(e, ast.Compare) and len(e.ops) == 1:
+            left, right = e.left, e.comparators[0]
+            if self.is_nw(left) and isinstance(e.ops[0], ast.GtE) and \
+                    not self.is_nw(right):
+                return self.nw_test(left, ">=", right)
+            elif not self.is_nw(left) and not self.is_nw(right):
+                op = {ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<",
+                      ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">="} \
+                    .get(type(e.ops[0]))
+                if op is not None:
+                    return "(%s %s %s)" % \
+                           (self.plain(left), op, self.plain(right))
+        elif isinstance(e, ast.Call) and \
+                isinstance(e.func, ast.Attribute) and \
+                e.func.attr == "is_eq" and self.is_nw(e.func.value) and \
+                len(e.args) == 1 and not self.is_nw(e.args[0]):
+            return self.nw_test(e.func.value, "==", e.args[0])
+        elif isinstance(e, ast.BinOp) and \
+                not self.is_nw(e.left) and not self.is_nw(e.right):
+            op = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*",
+                  ast.BitAnd: "&", ast.BitOr: "|"}.get(type(e.op))
+            if op is not None:
+                return "(%s %s %s)" % \
+                       (self.plain(e.left), op, self.plain(e.right))
+        raise ValueError("cannot compile: %s" % ast.dump(e))
+
+
+# The names of local variables in the generated code start with `_`,
+# so that they cannot clash with the names of counters.
+
+def function_ast(f: Callable) -> Tuple[List[str], ast.expr]:
+    fdef = ast.parse(textwrap.dedent(inspect.getsource(f))).body[0]
+    if not isinstance(fdef, ast.FunctionDef) or len(fdef.body) != 1 or \
+            not isinstance(fdef.body[0], ast.Return):
+        raise ValueError("cannot compile %s" % f.__name__)
+    params = [a.arg for a in fdef.args.args]
+    if any(p.startswith("_") or p == "OMEGA" for p in params):
+        raise ValueError("cannot compile %s" % f.__name__)
+    return params, fdef.body[0].value
+
+
+def compile_rules(cnt: CountersWorld) -> str:
+    params, e = function_ast(type(cnt).rules)
+    if not isinstance(e, ast.List):
+        raise ValueError("cannot compile rules")
+    rc = RuleCompiler(params)
+    lines = ["def drive(_c):",
+             "    %s, = _c" % ", ".join(params),
+             "    _cs = []"]
+    for r in e.elts:
+        if not (isinstance(r, ast.Tuple) and len(r.elts) == 2 and
+                isinstance(r.elts[1], ast.List)):
+            raise ValueError("cannot compile rules")
+        guard, conf = r.elts
+        lines.append("    if %s:" % rc.plain(guard))
+        lines.append("        _cs.append((%s,))" %
+                     ", ".join(map(rc.nw, conf.elts)))
+    lines.append("    return _cs")
+    return "\n".join(lines)
+
+
+def compile_is_unsafe(cnt: CountersWorld) -> str:
+    params, e = function_ast(type(cnt).is_unsafe)
+    rc = RuleCompiler(params)
+    return "\n".join(["def is_unsafe(_c):",
+                      "    %s, = _c" % ", ".join(params),
+                      "    return bool(%s)" % rc.plain(e)])
+
+
+class CompiledRules:
+
+    def __init__(self, cnt: CountersWorld):
+        self.drive_source = compile_rules(cnt)
+        self.is_unsafe_source = compile_is_unsafe(cnt)
+        env = {"OMEGA": OMEGA}
+        exec(self.drive_source, env)
+        exec(self.is_unsafe_source, env)
+        self.drive: Callable[[CC], List[CC]] = env["drive"]
+        self.is_unsafe: Callable[[CC], bool] = env["is_unsafe"]
+
+
+def compile_counters_world(cnt: CountersWorld) -> CompiledRules:
+    return CompiledRules(cnt)
+
+
+# `CompiledCountersScWorld` is a `CompactCountersScWorld` whose
+# `drive` and `is_unsafe` are compiled.
+
+class CompiledCountersScWorld(CompactCountersScWorld):
+
+    def __init__(self, cnt: CountersWorld, max_nw: int, max_depth: int):
+        super().__init__(cnt, max_nw, max_depth)
+        self.compiled = compile_counters_world(cnt)
+        self.drive = self.compiled.drive
+        self.is_unsafe = self.compiled.is_unsafe
@@ -15,28 +15,43 @@
 # lazy graphs such that
 #   length_unroll(l) == unroll(l).length
 
-from typing import Tuple, List
+# `length_unroll` and `size_unroll` are implemented as semiring analyses
+# (see `eval_semiring`). Hence, the results are cached by node identity,
+# so that the cost of counting is linear in the number of distinct nodes
+# (of a lazy graph with shared subtrees), and several analyses can be
+# performed in a single pass by means of `TupleSemiring`.
+
+from typing import Tuple, Optional, List
+import numpy
 from numpy import long
 
-from smrsc.graph import LazyGraph, C, Empty, Stop, Build
+from smrsc.graph import \
+    C, Graph, Back, Forth, LazyGraph, Semiring, eval_semiring
 
 
-def length_unroll(l: LazyGraph[C]) -> long:
-    if isinstance(l, Empty):
+class LengthSemiring(Semiring[long]):
+
+    def zero(self) -> long:
         return 0
-    elif isinstance(l, Stop):
+
+    def one(self) -> long:
         return 1
-    elif isinstance(l, Build):
-        s: long = 0
-        for ls in l.lss:
-            m: long = 1
-            for l in ls:
-                m *= length_unroll(l)
-            s += m
-        return s
-    else:
-        raise ValueError
-    pass
+
+    def add(self, x1: long, x2: long) -> long:
+        return x1 + x2
+
+    def mul(self, x1: long, x2: long) -> long:
+        return x1 * x2
+
+    def stop(self, c: C) -> long:
+        return 1
+
+    def build(self, c: C, x: long) -> long:
+        return x
+
+
+def length_unroll(l: LazyGraph[C]) -> long:
+    return eval_semiring(LengthSemiring(), l)
 
 
 #
@@ -46,24 +61,160 @@ def length_unroll(l: LazyGraph[C]) -> long:
 #   size_unroll(l) == (unroll(l).length , unroll(l).map(graph_size).sum)
 #
 
-def size_unroll(l: LazyGraph[C]) -> Tuple[long, long]:
-    if isinstance(l, Empty):
+class SizeSemiring(Semiring[Tuple[long, long]]):
+
+    def zero(self) -> Tuple[long, long]:
         return 0, 0
-    elif isinstance(l, Stop):
+
+    def one(self) -> Tuple[long, long]:
+        return 1, 0
+
+    def add(self, x1: Tuple[long, long], x2: Tuple[long, long]) \
+            -> Tuple[long, long]:
+        k1, n1 = x1
+        k2, n2 = x2
+        return k1 + k2, n1 + n2
+
+    def mul(self, x1: Tuple[long, long], x2: Tuple[long, long]) \
+            -> Tuple[long, long]:
+        k1, n1 = x1
+        k2, n2 = x2
+        return k1 * k2, k1 * n2 + k2 * n1
+
+    def stop(self, c: C) -> Tuple[long, long]:
         return 1, 1
-    elif isinstance(l, Build):
-        k: long = 0
-        n: long = 0
-        for ls in l.lss:
-            k1, n1 = size_unroll_ls(ls)
-            k, n = k + k1, n + k1 + n1
-        return k, n
-
-
-def size_unroll_ls(ls: List[LazyGraph[C]]) -> Tuple[long, long]:
-    k: long = 1
-    n: long = 0
-    for l in ls:
-        k1, n1 = size_unroll(l)
-        k, n = k * k1, k * n1 + k1 * n
-    return k, n
+
+    def build(self, c: C, x: Tuple[long, long]) -> Tuple[long, long]:
+        k, n = x
+        return k, n + k
+
+
+def size_unroll(l: LazyGraph[C]) -> Tuple[long, long]:
+    return eval_semiring(SizeSemiring(), l)
+
+
+#
+# The maximal depth of graphs
+#
+#   depth_unroll(l) == max(unroll(l).map(graph_depth))
+#
+# where None stands for the depth of the empty set of graphs.
+#
+
+def graph_depth(g: Graph[C]) -> long:
+    if isinstance(g, Back):
+        return 1
+    elif isinstance(g, Forth):
+        return 1 + max(map(graph_depth, g.gs), default=0)
+    else:
+        raise ValueError
+
+
+class MaxDepthSemiring(Semiring[Optional[long]]):
+
+    def zero(self) -> Optional[long]:
+        return None
+
+    def one(self) -> Optional[long]:
+        return 0
+
+    def add(self, x1: Optional[long], x2: Optional[long]) -> Optional[long]:
+        if x1 is None:
+            return x2
+        elif x2 is None:
+            return x1
+        else:
+            return max(x1, x2)
+
+    def mul(self, x1: Optional[long], x2: Optional[long]) -> Optional[long]:
+        if x1 is None or x2 is None:
+            return None
+        else:
+            return max(x1, x2)
+
+    def stop(self, c: C) -> Optional[long]:
+        return 1
+
+    def build(self, c: C, x: Optional[long]) -> Optional[long]:
+        return None if x is None else 1 + x
+
+
+def depth_unroll(l: LazyGraph[C]) -> Optional[long]:
+    return eval_semiring(MaxDepthSemiring(), l)
+
+
+#
+# The distribution of sizes
+#
+# `size_distribution(l)` is a list `p` such that `p[n]` is the number of
+# graphs of size `n` in `unroll(l)`. In other words, `p` is the list of
+# coefficients of the generating polynomial
+#     sum(x ** graph_size(g) for g in unroll(l))
+# Polynomials are added for alternatives, multiplied (convolved)
+# for the subtrees of an alternative and multiplied by `x` for a `Build`.
+#
+# Convolution can be performed by NumPy, provided that the coefficients
+# are small enough to be represented by 64-bit integers. Otherwise,
+# big integers are used, so that the result is always exact.
+
+Poly = List[long]
+
+MAX_INT64 = 2 ** 63 - 1
+
+
+def poly_add(p1: Poly, p2: Poly) -> Poly:
+    if len(p1) < len(p2):
+        p1, p2 = p2, p1
+    p = list(p1)
+    for i, a in enumerate(p2):
+        p[i] += a
+    return p
+
+
+def poly_mul(p1: Poly, p2: Poly) -> Poly:
+    if len(p1) == 0 or len(p2) == 0:
+        return []
+    p = [0] * (len(p1) + len(p2) - 1)
+    for i, a in enumerate(p1):
+        if a != 0:
+            for j, b in enumerate(p2):
+                p[i + j] += a * b
+    return p
+
+
+def poly_mul_numpy(p1: Poly, p2: Poly) -> Poly:
+    if len(p1) == 0 or len(p2) == 0:
+        return []
+    if max(p1) * max(p2) * min(len(p1), len(p2)) > MAX_INT64:
+        return poly_mul(p1, p2)
+    return [int(a) for a in numpy.convolve(
+        numpy.array(p1, dtype=numpy.int64),
+        numpy.array(p2, dtype=numpy.int64))]
+
+
+class SizeDistributionSemiring(Semiring[Poly]):
+
+    def __init__(self, use_numpy: bool = False):
+        self.poly_mul = poly_mul_numpy if use_numpy else poly_mul
+
+    def zero(self) -> Poly:
+        return []
+
+    def one(self) -> Poly:
+        return [1]
+
+    def add(self, x1: Poly, x2: Poly) -> Poly:
+        return poly_add(x1, x2)
+
+    def mul(self, x1: Poly, x2: Poly) -> Poly:
+        return self.poly_mul(x1, x2)
+
+    def stop(self, c: C) -> Poly:
+        return [0, 1]
+
+    def build(self, c: C, x: Poly) -> Poly:
+        return [0] + x if len(x) > 0 else []
+
+
+def size_distribution(l: LazyGraph[C], use_numpy: bool = False) -> Poly:
+    return eval_semiring(SizeDistributionSemiring(use_numpy), l)
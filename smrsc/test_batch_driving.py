@@ -0,0 +1,46 @@
+import unittest
+
+import numpy
+
+from smrsc.batch_driving import \
+    BatchRules, develop_batch, NumpySubsumptionIndex
+from smrsc.big_step_sc import lazy_mrsc
+from smrsc.counters import CompactCountersScWorld, SubsumptionIndex
+from smrsc.protocols import Futurebus
+from smrsc.rule_compiler import compile_counters_world
+from smrsc.test_rule_compiler import protocols, sample_confs
+
+
+class BatchDrivingTests(unittest.TestCase):
+
+    def test_develop_batch(self):
+        for cnt in protocols:
+            w = CompactCountersScWorld(cnt, 3, 10)
+            r = compile_counters_world(cnt)
+            br = BatchRules(cnt)
+            cs = list(sample_confs(len(w.start)))
+            ps, ss, unsafe, too_big = develop_batch(br, numpy.array(cs), 3)
+            for i, c in enumerate(cs):
+                self.assertEqual(
+                    [tuple(map(int, s)) for p, s in zip(ps[i], ss[i]) if p],
+                    r.drive(c))
+                self.assertEqual(bool(unsafe[i]), r.is_unsafe(c))
+                self.assertEqual(bool(too_big[i]), w.is_too_big(c))
+
+    def test_numpy_subsumption_index(self):
+        cs = list(sample_confs(4))
+        index, nindex = SubsumptionIndex(), NumpySubsumptionIndex()
+        for c in cs[::37]:
+            index, nindex = index.add(c), nindex.add(c)
+        self.assertEqual([nindex.covers(c) for c in cs],
+                         [index.covers(c) for c in cs])
+
+    def test_numpy_fold_index(self):
+        w = CompactCountersScWorld(Futurebus(), 3, 6)
+        nw = CompactCountersScWorld(Futurebus(), 3, 6)
+        nw.fold_index_class = NumpySubsumptionIndex
+        self.assertEqual(lazy_mrsc(nw, nw.start), lazy_mrsc(w, w.start))
+
+
+if __name__ == '__main__':
+    unittest.main()
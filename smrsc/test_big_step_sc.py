@@ -19,6 +19,17 @@ def lazy_mrsc(c: int):
     return smrsc.big_step_sc.lazy_mrsc(MockScWorld(), c)
 
 
+def lazy_mrsc_dag(c: int):
+    return smrsc.big_step_sc.lazy_mrsc_dag(MockScWorld(), c)
+
+
+# The same world, but with unhashable configurations.
+
+class ListMockScWorld(MockScWorld):
+    def develop(self, c):
+        return [[[c1] for c1 in cs] for cs in super().develop(c[0])]
+
+
 class BigStepScTests(unittest.TestCase):
     def test_naive_mrsc(self):
         self.assertEqual(naive_mrsc(0), gs3)
@@ -26,6 +37,28 @@ class BigStepScTests(unittest.TestCase):
     def test_lazy_mrsc(self):
         self.assertEqual(unroll(lazy_mrsc(0)), gs3)
 
+    def test_lazy_mrsc_dag(self):
+        l = lazy_mrsc_dag(0)
+        self.assertEqual(l, lazy_mrsc(0))
+        self.assertEqual(unroll(l), gs3)
+
+    def test_lazy_mrsc_dag_lists(self):
+        w = ListMockScWorld()
+        self.assertEqual(
+            unroll(smrsc.big_step_sc.lazy_mrsc_dag(w, [0])),
+            unroll(smrsc.big_step_sc.lazy_mrsc(w, [0])))
+
+    def test_persistent_history(self):
+        w = MockScWorld()
+        h = w.empty_history()
+        h1 = w.extend_history(w.extend_history(h, 0), 1)
+        h2 = w.extend_history(h1, 2)
+        h3 = w.extend_history(h1, 3)
+        self.assertEqual((len(h), len(h1), len(h2)), (0, 2, 3))
+        self.assertEqual(list(h2), [2, 1, 0])
+        self.assertEqual(list(h3), [3, 1, 0])
+        self.assertIs(h2.tail, h3.tail)
+
     def test_min_size_cl(self):
         self.assertEqual(
             unroll(cl_min_size(lazy_mrsc(0))),
@@ -1,10 +1,14 @@
 import unittest
 from typing import List, Tuple
 
-from smrsc.graph import Graph, Back, Forth, unroll, cl_min_size, LazyGraph
-from smrsc.big_step_sc import naive_mrsc, lazy_mrsc
+from smrsc.graph import \
+    Graph, Back, Forth, unroll, cl_min_size, LazyGraph, cl_empty_and_bad
+from smrsc.big_step_sc import naive_mrsc, lazy_mrsc, lazy_mrsc_dag
 from smrsc.counters import \
-    NW, N, W, w, CountersWorld, CountersScWorld, norm_nw_conf
+    NW, N, W, w, CountersWorld, CountersScWorld, norm_nw_conf, \
+    CompactCountersScWorld, OMEGA, encode_conf, decode_conf, SubsumptionIndex
+from smrsc.protocols import MOESI
+from smrsc.statistics import size_unroll
 
 
 class TestCountersWorld(CountersWorld):
@@ -34,6 +38,23 @@ mg: Graph[List[NW]] = \
 w = CountersScWorld(TestCountersWorld(), 3, 10)
 
 
+def count_nodes(l: LazyGraph, seen=None) -> int:
+    if seen is None:
+        seen = set()
+    if id(l) in seen:
+        return 0
+    seen.add(id(l))
+    return 1 + sum(count_nodes(l1, seen)
+                   for ls in getattr(l, 'lss', []) for l1 in ls)
+
+
+def decode_graph(g: Graph) -> Graph:
+    if isinstance(g, Back):
+        return Back(decode_conf(g.c))
+    else:
+        return Forth(decode_conf(g.c), list(map(decode_graph, g.gs)))
+
+
 class GraphTests(unittest.TestCase):
 
     def test_naive_mrsc__lazy_mrsc(self):
@@ -45,6 +66,65 @@ class GraphTests(unittest.TestCase):
         ml = cl_min_size(l)
         self.assertEqual(unroll(ml)[0], mg)
 
+    def test_lazy_mrsc_dag(self):
+        start_conf = norm_nw_conf(w.cnt.start())
+        l = lazy_mrsc(w, start_conf)
+        dl = lazy_mrsc_dag(w, start_conf)
+        self.assertEqual(dl, l)
+        self.assertLess(count_nodes(dl), count_nodes(l))
+        self.assertEqual(unroll(cl_min_size(dl))[0], mg)
+
+    def test_history_summary(self):
+        h = w.empty_history()
+        h1 = w.extend_history(h, [N(1), N(0)])
+        h2 = w.extend_history(h1, [N(3), W()])
+        self.assertFalse(h1.summary)
+        self.assertTrue(h2.summary)
+        self.assertTrue(w.extend_history(h2, [N(0), N(0)]).summary)
+        self.assertEqual(w.is_dangerous(h2), w.is_dangerous(list(h2)))
+
+    def test_subsumption_index(self):
+        cw = CompactCountersScWorld(TestCountersWorld(), 3, 10)
+        cs = [(OMEGA, 1), (2, OMEGA), (0, 0), (OMEGA, OMEGA), (1, 2)]
+        tests = [(i, j) for i in [OMEGA, 0, 1, 2] for j in [OMEGA, 0, 1, 2]]
+        for n in range(len(cs) + 1):
+            index = SubsumptionIndex()
+            for c in cs[:n]:
+                index = index.add(c)
+            for c in tests:
+                self.assertEqual(
+                    index.covers(c),
+                    any(cw.is_foldable_to(c, c1) for c1 in cs[:n]))
+
+    def test_fold_index(self):
+        class UnindexedWorld(CountersScWorld):
+            def initial_fold_index(self):
+                return None
+
+        uw = UnindexedWorld(TestCountersWorld(), 3, 10)
+        self.assertEqual(lazy_mrsc(w, w.start), lazy_mrsc(uw, uw.start))
+
+    def test_encode_conf(self):
+        self.assertEqual(encode_conf([W(), 0, N(2)]), (OMEGA, 0, 2))
+        self.assertEqual(decode_conf((OMEGA, 0, 2)), [W(), N(0), N(2)])
+        self.assertEqual(decode_conf(encode_conf([N(-1)])), [N(-1)])
+
+    def test_compact_lazy_mrsc(self):
+        cw = CompactCountersScWorld(TestCountersWorld(), 3, 10)
+        l = lazy_mrsc(w, w.start)
+        cl = lazy_mrsc(cw, cw.start)
+        self.assertEqual(list(map(decode_graph, unroll(cl))), unroll(l))
+        self.assertEqual(decode_graph(unroll(cl_min_size(cl))[0]), mg)
+
+    def test_compact_protocol(self):
+        w1 = CountersScWorld(MOESI(), 3, 5)
+        cw1 = CompactCountersScWorld(MOESI(), 3, 5)
+        sl = cl_empty_and_bad(w1.is_unsafe)(lazy_mrsc(w1, w1.start))
+        csl = cl_empty_and_bad(cw1.is_unsafe)(lazy_mrsc(cw1, cw1.start))
+        self.assertEqual(size_unroll(csl), size_unroll(sl))
+        self.assertEqual(decode_graph(unroll(cl_min_size(csl))[0]),
+                         unroll(cl_min_size(sl))[0])
+
 
 if __name__ == '__main__':
     unittest.main()
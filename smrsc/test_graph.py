@@ -62,6 +62,13 @@ l3 = \
         [Build(3, [
             [Stop(4)]])]])
 
+l_shared_sub = \
+    Build(2, [
+        [Stop(1)],
+        [Stop(3), Empty()]])
+
+l_shared = Build(1, [[l_shared_sub, l_shared_sub]])
+
 
 class GraphTests(unittest.TestCase):
 
@@ -81,6 +88,27 @@ class GraphTests(unittest.TestCase):
     def test_unroll(self):
         self.assertEqual(unroll(l2), gs2)
 
+    def test_iter_unroll(self):
+        self.assertEqual(list(iter_unroll(Empty())), [])
+        self.assertEqual(list(iter_unroll(Stop(100))), [Back(100)])
+        self.assertEqual(list(iter_unroll(l2)), gs2)
+        self.assertEqual(list(iter_unroll(l_empty)), unroll(l_empty))
+
+    def test_iter_unroll_islice(self):
+        l = Stop(0)
+        for i in range(50):
+            l = Build(i, [[l], [l, l]])
+        g = next(iter_unroll(l))
+        self.assertEqual(graph_size(g), 51)
+        self.assertEqual(list(itertools.islice(iter_unroll(l2), 1)), gs2[:1])
+
+    def test_iter_unroll_skips_empty(self):
+        l = Stop(0)
+        for i in range(60):
+            l = Build(i, [[l], [l]])
+        l = Build(-1, [[l, Empty()], [Stop(1)]])
+        self.assertEqual(next(iter_unroll(l)), Forth(-1, [Back(1)]))
+
     def test_not_bad(self):
         self.assertFalse(bad_graph(ibad)(g1))
 
@@ -93,6 +121,23 @@ class GraphTests(unittest.TestCase):
     def test_cl_empty(self):
         self.assertEqual(cl_empty(l_empty), Build(1, [[Stop(2)]]))
 
+    def test_cl_empty_shared(self):
+        l = cl_empty(l_shared)
+        self.assertEqual(
+            l,
+            Build(1, [[Build(2, [[Stop(1)]]), Build(2, [[Stop(1)]])]]))
+        self.assertIs(l.lss[0][0], l.lss[0][1])
+
+    def test_cl_bad_conf_shared(self):
+        cs = []
+
+        def bad(c):
+            cs.append(c)
+            return c < 0
+
+        cl_bad_conf(bad)(l_shared)
+        self.assertEqual(sorted(cs), [1, 1, 2, 3])
+
     def test_lazy_bad_forth(self):
         self.assertEqual(
             cl_bad_conf(ibad)(l_bad_forth),
@@ -122,6 +167,27 @@ class GraphTests(unittest.TestCase):
                 [Build(3, [
                     [Stop(4)]])]]))
 
+    def test_min_size_cl_shared(self):
+        l = cl_min_size(l_shared)
+        self.assertEqual(
+            l,
+            Build(1, [[Build(2, [[Stop(1)]]), Build(2, [[Stop(1)]])]]))
+        self.assertIs(l.lss[0][0], l.lss[0][1])
+
+    def test_min_size_cl_wide(self):
+        ls = [Stop(i) for i in range(3000)]
+        self.assertEqual(sel_min_size(Build(0, [ls])), (3001, Build(0, [ls])))
+
+    def test_top_k_size_cl(self):
+        l = Build(0, [[l2, l3], [l_empty], [Stop(5)], [l3, l3, l3]])
+        sizes = sorted(map(graph_size, unroll(l)))
+        for k in range(len(sizes) + 2):
+            gs = unroll(cl_top_k_size(l, k))
+            self.assertEqual(list(map(graph_size, gs)), sizes[:k])
+            self.assertTrue(all(g in unroll(l) for g in gs))
+        self.assertEqual(cl_top_k_size(Empty(), 3), Empty())
+        self.assertEqual(cl_top_k_size(Stop(1), 3), Stop(1))
+
     def test_min_size_cl_unroll(self):
         min_l = cl_min_size(l3)
         min_g = unroll(min_l)[0]
@@ -0,0 +1,84 @@
+import unittest
+
+from smrsc.graph import *
+from smrsc.mock_sc_world import *
+import smrsc.big_step_sc
+from smrsc.ranking import *
+
+
+def lazy_mrsc(c: int):
+    return smrsc.big_step_sc.lazy_mrsc(MockScWorld(), c)
+
+
+l1: LazyGraph[C] = lazy_mrsc(0)
+ul1: List[Graph[C]] = unroll(l1)
+
+l2 = \
+    Build(1, [
+        [Build(2, [[Stop(1)], [Stop(2)]]), Stop(3), Empty()],
+        [Build(2, [[Stop(1)], [Stop(2)]]),
+         Build(3, [[Stop(3)], [Stop(4)], [Stop(5)]])],
+        [Stop(4)]])
+ul2: List[Graph[C]] = unroll(l2)
+
+
+def shared_chain(n: int) -> LazyGraph[int]:
+    l = Stop(0)
+    for i in range(n):
+        l = Build(i, [[l], [Stop(i), l]])
+    return l
+
+
+class RankingTests(unittest.TestCase):
+
+    def test_nth_graph(self):
+        for l, ul in [(l1, ul1), (l2, ul2)]:
+            self.assertEqual([nth_graph(l, i) for i in range(len(ul))], ul)
+        self.assertEqual(nth_graph(l2, -1), ul2[-1])
+
+    def test_nth_graph_out_of_range(self):
+        with self.assertRaises(IndexError):
+            nth_graph(l2, len(ul2))
+        with self.assertRaises(IndexError):
+            nth_graph(Empty(), 0)
+
+    def test_graph_index(self):
+        for l, ul in [(l1, ul1), (l2, ul2)]:
+            for g in ul:
+                self.assertEqual(graph_index(l, g), ul.index(g))
+
+    def test_graph_index_missing(self):
+        with self.assertRaises(ValueError):
+            graph_index(l2, Back(1))
+
+    def test_shared_chain(self):
+        l = shared_chain(100)
+        t = LengthTable(l)
+        n = t.length()
+        self.assertEqual(n, 2 ** 100)
+        for i in [0, 1, n // 3, n - 1]:
+            self.assertEqual(t.index(t.nth(i)), i)
+
+    def test_sample_graphs(self):
+        gs = sample_graphs(l2, 200, seed=1)
+        self.assertTrue(all(g in ul2 for g in gs))
+        self.assertEqual(gs, sample_graphs(l2, 200, seed=1))
+        self.assertEqual(set(map(str, gs)), set(map(str, ul2)))
+
+    def test_sample_graphs_without_replacement(self):
+        gs = sample_graphs(l2, len(ul2), replace=False, seed=2)
+        self.assertEqual(sorted(map(str, gs)), sorted(map(str, ul2)))
+        with self.assertRaises(ValueError):
+            sample_graphs(l2, len(ul2) + 1, replace=False)
+        with self.assertRaises(ValueError):
+            sample_graphs(Empty(), 1)
+
+    def test_sample_graphs_shared_chain(self):
+        l = shared_chain(100)
+        t = LengthTable(l)
+        gs = sample_graphs(l, 50, replace=False, seed=3, table=t)
+        self.assertEqual(len(set(t.index(g) for g in gs)), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
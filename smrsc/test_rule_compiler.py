@@ -0,0 +1,56 @@
+import itertools
+import unittest
+
+from smrsc.big_step_sc import lazy_mrsc
+from smrsc.counters import CompactCountersScWorld, OMEGA
+from smrsc.graph import cl_empty_and_bad, cl_min_size
+from smrsc.protocols import *
+from smrsc.rule_compiler import \
+    compile_counters_world, CompiledCountersScWorld
+from smrsc.statistics import size_unroll
+
+protocols = [Synapse(), MSI(), MOSI(), ReaderWriter(), MESI(), MOESI(),
+             Illinois(), Berkley(), Firefly(), Futurebus(), Xerox(),
+             DataRace()]
+
+
+def sample_confs(k: int):
+    vs = [OMEGA, 0, 1, 2]
+    if k <= 6:
+        return itertools.product(vs, repeat=k)
+    else:
+        return (tuple(vs[(i * 7 + j * 3 + i // (j + 1)) % 4]
+                      for j in range(k))
+                for i in range(2000))
+
+
+class RuleCompilerTests(unittest.TestCase):
+
+    def test_compiled_rules(self):
+        for cnt in protocols:
+            w = CompactCountersScWorld(cnt, 3, 10)
+            r = compile_counters_world(cnt)
+            for c in sample_confs(len(w.start)):
+                self.assertEqual(r.drive(c), w.drive(c))
+                self.assertEqual(r.is_unsafe(c), w.is_unsafe(c))
+
+    def test_compiled_world(self):
+        w = CompactCountersScWorld(MOESI(), 3, 5)
+        cw = CompiledCountersScWorld(MOESI(), 3, 5)
+        sl = cl_empty_and_bad(w.is_unsafe)(lazy_mrsc(w, w.start))
+        csl = cl_empty_and_bad(cw.is_unsafe)(lazy_mrsc(cw, cw.start))
+        self.assertEqual(size_unroll(csl), size_unroll(sl))
+        self.assertEqual(cl_min_size(csl), cl_min_size(sl))
+
+    def test_cannot_compile(self):
+        class Bad(MSI):
+            @staticmethod
+            def rules(i, m, s):
+                return [(i.is_in(m), [i, m, s])]
+
+        with self.assertRaises(ValueError):
+            compile_counters_world(Bad())
+
+
+if __name__ == '__main__':
+    unittest.main()
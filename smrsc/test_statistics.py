@@ -18,6 +18,18 @@ l1: LazyGraph[C] = lazy_mrsc(0)
 ul1: List[Graph[C]] = unroll(l1)
 
 
+# A DAG representing 2^100 graphs of size 101.
+
+def shared_chain(n: int) -> LazyGraph[int]:
+    l = Stop(0)
+    for i in range(n):
+        l = Build(i, [[l], [l]])
+    return l
+
+
+l_shared = shared_chain(100)
+
+
 class BigStepScTests(unittest.TestCase):
     def test_len_unroll(self):
         self.assertEqual(length_unroll(l1), len(ul1))
@@ -27,6 +39,50 @@ class BigStepScTests(unittest.TestCase):
             size_unroll(l1),
             (len(ul1), sum(map(graph_size, ul1))))
 
+    def test_depth_unroll(self):
+        self.assertEqual(depth_unroll(l1), max(map(graph_depth, ul1)))
+        self.assertEqual(depth_unroll(Empty()), None)
+
+    def test_tuple_semiring(self):
+        s = TupleSemiring(LengthSemiring(), SizeSemiring(),
+                          MaxDepthSemiring(), MinSizeSemiring())
+        k, kn, d, (m, (ml, _)) = eval_semiring(s, l1)
+        self.assertEqual(k, length_unroll(l1))
+        self.assertEqual(kn, size_unroll(l1))
+        self.assertEqual(d, depth_unroll(l1))
+        self.assertEqual((m, ml), sel_min_size(l1))
+
+    def test_size_distribution(self):
+        p = [0] * (max(map(graph_size, ul1)) + 1)
+        for g in ul1:
+            p[graph_size(g)] += 1
+        self.assertEqual(size_distribution(l1), p)
+        self.assertEqual(size_distribution(l1, use_numpy=True), p)
+        self.assertEqual(size_distribution(Empty()), [])
+
+    def test_size_distribution_big(self):
+        l = Stop(0)
+        for i in range(100):
+            l = Build(i, [[l], [l, Stop(i)]])
+        p = size_distribution(l)
+        self.assertEqual(size_distribution(l, use_numpy=True), p)
+        self.assertEqual(sum(p), length_unroll(l))
+        self.assertEqual(sum(n * k for n, k in enumerate(p)),
+                         size_unroll(l)[1])
+
+    def test_len_unroll_shared(self):
+        self.assertEqual(length_unroll(l_shared), 2 ** 100)
+
+    def test_size_unroll_shared(self):
+        self.assertEqual(size_unroll(l_shared), (2 ** 100, 101 * 2 ** 100))
+
+    def test_len_unroll_fresh_graphs(self):
+        for n in range(1, 30):
+            self.assertEqual(length_unroll(shared_chain(n)), 2 ** n)
+
+    def test_depth_unroll_shared(self):
+        self.assertEqual(depth_unroll(l_shared), 101)
+
 
 if __name__ == '__main__':
     unittest.main()